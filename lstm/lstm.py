@@ -1,6 +1,7 @@
 import jax
 import jax.numpy as jnp
-from utils import RANDOM_SEED, rng_normal, sigmoid, LSTMParams, LSTMArchiParams, rng_unif
+from jax.typing import DTypeLike
+from utils import RANDOM_SEED, rng_normal, LSTMParams, LSTMArchiParams, rng_unif
 
 class LSTM:
     @staticmethod
@@ -8,117 +9,81 @@ class LSTM:
         seed: int,
         input_dim: int,
         hidden_dim: int,
-        output_dim: int
+        output_dim: int,
+        dtype: DTypeLike = jnp.bfloat16,
+        unroll: int = 1
     ) -> tuple[LSTMArchiParams, LSTMParams]:
         key = jax.random.PRNGKey(seed)
-        wf = rng_unif(key=key, shape=(hidden_dim, input_dim))
-        uf = rng_unif(key=key, shape=(hidden_dim, hidden_dim))
-        bf = rng_unif(key=key, shape=(hidden_dim, 1))
-        wi = rng_unif(key=key, shape=(hidden_dim, input_dim))
-        ui = rng_unif(key=key, shape=(hidden_dim, hidden_dim))
-        bi = rng_unif(key=key, shape=(hidden_dim, 1))
-        wc = rng_unif(key=key, shape=(hidden_dim, input_dim))
-        uc = rng_unif(key=key, shape=(hidden_dim, hidden_dim))
-        bc = rng_unif(key=key, shape=(hidden_dim, 1))
-        wo = rng_unif(key=key, shape=(hidden_dim, input_dim))
-        uo = rng_unif(key=key, shape=(hidden_dim, hidden_dim))
-        bo = rng_unif(key=key, shape=(hidden_dim, 1))
-        wout = rng_unif(key=key, shape=(output_dim, hidden_dim))
-        return LSTMArchiParams(key, input_dim, hidden_dim, output_dim), \
-            LSTMParams(wf, uf, bf, wi, ui, bi, wc, uc, bc, wo, uo, bo, wout)
+        key_w, key_u, key_b, key_out = jax.random.split(key, 4)
+        W_all = rng_unif(key=key_w, shape=(4 * hidden_dim, input_dim), fan=hidden_dim)
+        U_all = rng_unif(key=key_u, shape=(4 * hidden_dim, hidden_dim), fan=hidden_dim)
+        b_all = rng_unif(key=key_b, shape=(4 * hidden_dim,), fan=hidden_dim)
+        wout = rng_unif(key=key_out, shape=(output_dim, hidden_dim))
+        # Keep these device arrays between steps; converting to numpy/lists forces a re-upload.
+        device = jax.devices()[0]
+        params = jax.tree.map(lambda a: jax.device_put(a, device), LSTMParams(W_all, U_all, b_all, wout))
+        return LSTMArchiParams(key, input_dim, hidden_dim, output_dim, dtype, unroll), params
 
     @staticmethod
-    @jax.jit
-    def f_cur(
-        params: LSTMParams, 
-        x_cur: jnp.ndarray, 
-        h_prev: jnp.ndarray
-    ) -> jnp.ndarray:
-        return sigmoid((params.uf @ h_prev) + (params.wf @ x_cur) + params.bf)
-    
-    @staticmethod
-    @jax.jit
-    def i_cur(
-        params: LSTMParams, 
-        x_cur: jnp.ndarray, 
-        h_prev: jnp.ndarray
-    ) -> jnp.ndarray:
-        return sigmoid((params.ui @ h_prev) + (params.wi @ x_cur) + params.bi)
-
-    @staticmethod
-    @jax.jit
-    def c_cur_hat(
+    def input_proj(
         params: LSTMParams,
-        x_cur: jnp.ndarray,
-        h_prev: jnp.ndarray
+        x_in: jnp.ndarray
     ) -> jnp.ndarray:
-        return jnp.tanh((params.uc @ h_prev) + (params.wc @ x_cur) + params.bc)
+        return x_in.astype(params.W_all.dtype) @ params.W_all.T + params.b_all
 
     @staticmethod
-    @jax.jit
-    def c_cur(
-        params: LSTMParams, 
-        x_cur: jnp.ndarray, 
-        h_prev: jnp.ndarray, 
-        c_prev: jnp.ndarray
-    ) -> jnp.ndarray:
-        i_t = LSTM.i_cur(params, x_cur, h_prev)
-        c_t_hat = LSTM.c_cur_hat(params, x_cur, h_prev)
-        f_t = LSTM.f_cur(params, x_cur, h_prev)
-        return f_t * c_prev + i_t * c_t_hat
-        
-    
-    @staticmethod
-    @jax.jit
-    def o_cur(
-        params: LSTMParams, 
-        x_cur: jnp.ndarray, 
-        h_prev: jnp.ndarray
-    ) -> jnp.ndarray:
-        return sigmoid(params.uo @ h_prev + params.wo @ x_cur + params.bo)
-    
-    @staticmethod
-    @jax.jit
-    def h_cur(
-        params: LSTMParams, 
-        x_cur: jnp.ndarray, 
-        h_prev: jnp.ndarray, 
+    def cell(
+        params: LSTMParams,
+        x_proj_cur: jnp.ndarray,
+        h_prev: jnp.ndarray,
         c_prev: jnp.ndarray
-    ) -> jnp.ndarray:
-        o_t = LSTM.o_cur(params, x_cur, h_prev)
-        c_t = LSTM.c_cur(params, x_cur, h_prev, c_prev)
-        return o_t * jnp.tanh(c_t), c_t
-        
+    ) -> tuple[jnp.ndarray, jnp.ndarray]:
+        pre = (x_proj_cur + h_prev @ params.U_all.T).astype(jnp.float32)
+        f_pre, i_pre, c_pre, o_pre = jnp.split(pre, 4, axis=-1)
+        c_t = jax.nn.sigmoid(f_pre) * c_prev + jax.nn.sigmoid(i_pre) * jnp.tanh(c_pre)
+        h_t = jax.nn.sigmoid(o_pre) * jnp.tanh(c_t)
+        return h_t.astype(params.U_all.dtype), c_t
+
     @staticmethod
     def forward(
         tup: tuple[jnp.ndarray, jnp.ndarray, jnp.ndarray],
-        x_cur: jnp.ndarray
+        x_proj_cur: jnp.ndarray
     ) -> tuple[jnp.ndarray, jnp.ndarray, jnp.ndarray]:
         params, h_prev, c_prev = tup
-        h_t, c_t = LSTM.h_cur(params, x_cur, h_prev, c_prev)
-        out_t = params.wout @ h_t
-        return (params, h_t, c_t), out_t
+        h_t, c_t = LSTM.cell(params, x_proj_cur, h_prev, c_prev)
+        return (params, h_t, c_t), h_t
 
     @staticmethod
+    @jax.jit
     def forward_full(
         archi_params: LSTMArchiParams,
         params: LSTMParams, 
         x_in: jnp.ndarray
     ) -> jnp.ndarray:
-        h, c = jnp.zeros(shape=(archi_params.hidden_dim, 1)), jnp.zeros(shape=(archi_params.hidden_dim, 1))
-        (params, h, c), out_ls = jax.lax.scan(LSTM.forward, (params, h, c), x_in[0])
-        return out_ls
+        state_shape = x_in.shape[1:-1] + (archi_params.hidden_dim,)
+        h, c = jnp.zeros(shape=state_shape, dtype=archi_params.dtype), jnp.zeros(shape=state_shape, dtype=jnp.float32)
+        compute_params = params._replace(
+            W_all=params.W_all.astype(archi_params.dtype),
+            U_all=params.U_all.astype(archi_params.dtype),
+            b_all=params.b_all.astype(archi_params.dtype)
+        )
+        x_proj = LSTM.input_proj(compute_params, x_in)
+        (compute_params, h, c), h_ls = jax.lax.scan(LSTM.forward, (compute_params, h, c), x_proj, unroll=archi_params.unroll)
+        return h_ls @ params.wout.T
     
     @staticmethod
+    @jax.jit
     def forward_batch(
         archi_params: LSTMArchiParams,
         params: LSTMParams,
         x_batch: jnp.ndarray
     ) -> jnp.ndarray:
-        forward_full_batch = jax.vmap(LSTM.forward_full, in_axes=(None, None, 0))
-        return jnp.squeeze(forward_full_batch(archi_params, params, x_batch), axis=3)
+        x_seq = jnp.transpose(x_batch, (1, 0, 2))
+        out_seq = LSTM.forward_full(archi_params, params, x_seq)
+        return jnp.transpose(out_seq, (1, 0, 2))
     
     @staticmethod
+    @jax.jit
     def mse(
         archi_params: LSTMArchiParams,
         params: LSTMParams,
@@ -126,16 +91,37 @@ class LSTM:
         y_batch: jnp.ndarray
     ) -> jnp.ndarray:
         batch_out = LSTM.forward_batch(archi_params, params, x_batch)
-        return jnp.mean((batch_out - y_batch) ** 2)
+        return jnp.mean((batch_out.astype(jnp.float32) - y_batch) ** 2)
     
     @staticmethod
+    @jax.jit
     def backward(
         archi_params: LSTMArchiParams,
         params: LSTMParams,
         x_batch: jnp.ndarray,
         y_batch: jnp.ndarray
-    ) -> jnp.ndarray:
-        mse_grad = jax.jacfwd(LSTM.mse, argnums=(1,))
+    ) -> LSTMParams:
+        mse_grad = jax.grad(LSTM.mse, argnums=1)
         cur_grad = mse_grad(archi_params, params, x_batch, y_batch)
         return cur_grad
 
+    @staticmethod
+    @jax.jit
+    def train_steps(
+        archi_params: LSTMArchiParams,
+        params: LSTMParams,
+        x_batches: jnp.ndarray,
+        y_batches: jnp.ndarray,
+        lr: float
+    ) -> tuple[LSTMParams, jnp.ndarray]:
+        def step(
+            cur_params: LSTMParams,
+            batch: tuple[jnp.ndarray, jnp.ndarray]
+        ) -> tuple[LSTMParams, jnp.ndarray]:
+            x_batch, y_batch = batch
+            loss, cur_grad = jax.value_and_grad(LSTM.mse, argnums=1)(archi_params, cur_params, x_batch, y_batch)
+            new_params = jax.tree.map(lambda p, g: p - lr * g, cur_params, cur_grad)
+            return new_params, loss
+
+        params, losses = jax.lax.scan(step, params, (x_batches, y_batches))
+        return params, losses
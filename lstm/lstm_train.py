@@ -7,6 +7,7 @@ import optax
 import pickle
 from lstm import LSTM
 
+jax.config.update('jax_default_matmul_precision', 'bfloat16')
 sns.set_style("darkgrid")
 points = 1000
 key = jax.random.PRNGKey(seed=42)
@@ -31,10 +32,11 @@ def preprocess_ts(
         y, window_shape=(timestep,), axis=0
     )
 
-    x_window = jnp.expand_dims(x_window, axis=(1, 3, 4))
-    y_window = jnp.expand_dims(jnp.expand_dims(jnp.array(y_window), axis=2), axis=(3, 4))
+    x_window = jnp.expand_dims(x_window, axis=2)
+    y_window = jnp.expand_dims(y_window, axis=2)
     return jnp.array(x_window), jnp.array(y_window)
 
+data = (data - jnp.mean(data)) / jnp.std(data)
 x_window, y_window = preprocess_ts(data, data[1:], 5)
 
 num_epochs = 200
@@ -68,8 +70,8 @@ for epoch in range(num_epochs):
         x_batch = x_window[i * batch_size : (i + 1) * batch_size]
         y_batch = y_window[i * batch_size : (i + 1) * batch_size]
 
-        cur_grad = LSTM.backward(archi_params, params, x_batch, y_batch)[0]
-        if (jnp.any(jnp.isnan(cur_grad.wf))):
+        cur_grad = LSTM.backward(archi_params, params, x_batch, y_batch)
+        if (jnp.any(jnp.isnan(cur_grad.W_all))):
             continue
         updates, opt_state = optimiser.update(cur_grad, opt_state, params)
         new_params = optax.apply_updates(params, updates)
@@ -1,16 +1,15 @@
 import jax
 import jax.numpy as jnp
-from typing import NamedTuple
+from dataclasses import dataclass
+from typing import NamedTuple, Optional
 from jax import Array
+from jax.typing import DTypeLike
 
 RANDOM_SEED = 42
 
-@jax.jit
-def sigmoid(x: jnp.ndarray) -> jnp.ndarray:
-    return jnp.where(x >= 0, 1./(1. + jnp.exp(-x)), jnp.exp(x)/(1. + jnp.exp(x)))
-
-def rng_unif(key: Array, shape: tuple[int, int]) -> jnp.ndarray:
-    return jax.random.uniform(key=key, shape=shape, minval=-1/jnp.sqrt(shape[0]), maxval=1/jnp.sqrt(shape[0]))
+def rng_unif(key: Array, shape: tuple[int, int], fan: Optional[int] = None) -> jnp.ndarray:
+    fan = shape[0] if fan is None else fan
+    return jax.random.uniform(key=key, shape=shape, minval=-1/jnp.sqrt(fan), maxval=1/jnp.sqrt(fan))
 
 def rng_normal(key: Array, shape: tuple[int, int]) -> jnp.ndarray:
     return jax.random.normal(key=key, shape=shape) / jnp.sqrt(shape[0])
@@ -20,23 +19,25 @@ def mse(y_pred: jnp.ndarray, y_true: jnp.ndarray) -> jnp.ndarray:
     return jnp.mean((y_pred - y_true) ** 2)
 
 class LSTMParams(NamedTuple):
-    wf: jnp.ndarray
-    uf: jnp.ndarray
-    bf: jnp.ndarray
-    wi: jnp.ndarray
-    ui: jnp.ndarray
-    bi: jnp.ndarray
-    wc: jnp.ndarray
-    uc: jnp.ndarray
-    bc: jnp.ndarray
-    wo: jnp.ndarray
-    uo: jnp.ndarray
-    bo: jnp.ndarray
+    W_all: jnp.ndarray
+    U_all: jnp.ndarray
+    b_all: jnp.ndarray
     wout: jnp.ndarray
 
-class LSTMArchiParams(NamedTuple):
+@jax.tree_util.register_pytree_node_class
+@dataclass(frozen=True)
+class LSTMArchiParams:
     key: Array
     input_dim: int
     hidden_dim: int
     output_dim: int
+    dtype: DTypeLike
+    unroll: int = 1
+
+    def tree_flatten(self) -> tuple[tuple[Array], tuple]:
+        return (self.key,), (self.input_dim, self.hidden_dim, self.output_dim, self.dtype, self.unroll)
+
+    @classmethod
+    def tree_unflatten(cls, aux_data: tuple, children: tuple[Array]) -> "LSTMArchiParams":
+        return cls(*children, *aux_data)
 